@@ -1,13 +1,126 @@
+import aiohttp
+import asyncio
 import requests
-from bs4 import BeautifulSoup
+import requests_cache
+from selectolax.lexbor import LexborHTMLParser
+import functools
+import html
+import re
 import sys
 import argparse
 import subprocess
 import os
 
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+try:
+    from pybloom_live import ScalableBloomFilter
+except ImportError:
+    ScalableBloomFilter = None
+
 # Define the maximum length for summaries to use in comparison
 MAX_SUMMARY_LENGTH = 50
 
+@functools.lru_cache(maxsize=1)
+def get_session():
+    """
+    Returns a process-wide requests.Session.
+
+    Reusing one session keeps the underlying connections pooled, so
+    redirect chains and repeated requests to bugreports.qt.io skip the
+    TCP+TLS handshake after the first hop. The pool is sized well above
+    the default 10 so a burst of QTBUG fetches never evicts a warm
+    connection, and keep-alive is requested explicitly.
+    """
+    # Cache responses to disk and revalidate with conditional GETs, so
+    # repeated runs against the same QTBUG page skip the body download
+    # (a 304 costs one header-sized round trip).
+    session = requests_cache.CachedSession(
+        'qtbug_cache', expire_after=3600, cache_control=True)
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=32, pool_maxsize=32, max_retries=3)
+    session.mount('https://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    # Advertise brotli ahead of the defaults; urllib3 decompresses
+    # transparently and Jira pages shrink ~20% versus gzip alone.
+    session.headers['Accept-Encoding'] = 'br, gzip, deflate'
+    return session
+
+
+# The gerrit-subject cells are simple enough that a single linear regex
+# pass over the raw bytes beats building a DOM at all.
+_GERRIT_SUBJECT_RE = re.compile(
+    rb'<td[^>]*class="[^"]*\bnav\b[^"]*\bgerrit-subject\b[^"]*"[^>]*>\s*<a[^>]*>([^<]+)</a>',
+    re.IGNORECASE,
+)
+
+
+def extract_gerrit_titles(content, encoding='utf-8'):
+    """
+    Extracts the Gerrit subject titles from a QTBUG page body, truncating them.
+
+    A compiled regex over the raw bytes pulls the titles out in one pass
+    with no tree construction. If it finds nothing (e.g. Jira changed the
+    page layout), fall back to a full selectolax parse (which does its own
+    fast encoding detection in C on the raw bytes).
+
+    Args:
+        content: The raw HTML of the page, as bytes or str.
+        encoding: The charset declared by the transport (e.g. from the
+            Content-Type header); avoids sniffing. Defaults to UTF-8.
+
+    Returns:
+        A list of titles truncated to MAX_SUMMARY_LENGTH characters.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    titles = [html.unescape(m.group(1).decode(encoding, 'replace')).strip()[:MAX_SUMMARY_LENGTH]
+              for m in _GERRIT_SUBJECT_RE.finditer(content)]
+    if titles:
+        return titles
+
+    tree = LexborHTMLParser(content)
+    return [a.text(strip=True)[:MAX_SUMMARY_LENGTH]
+            for a in tree.css('td.nav.gerrit-subject a')]
+
+
+async def scrape_many(urls, cookies):
+    """
+    Scrapes several webpages for titles concurrently, using provided cookies.
+
+    All fetches share one aiohttp session and run in parallel on the event
+    loop, so N pages cost roughly one round trip instead of N. Parsing of
+    each body stays synchronous (selectolax is fast enough not to matter).
+
+    Args:
+        urls: A list of URLs to scrape.
+        cookies: A dictionary of cookies to use for the session.
+
+    Returns:
+        A list of title lists, one per URL, in the same order as urls.
+        An entry is None if that URL failed to fetch.
+    """
+    connector = aiohttp.TCPConnector(limit=20)
+    async with aiohttp.ClientSession(cookies=cookies, connector=connector) as session:
+
+        async def fetch(url):
+            try:
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    return await response.read()
+            except aiohttp.ClientError as e:
+                print(f"Error fetching {url}: {e}", file=sys.stderr)
+                return None
+
+        bodies = await asyncio.gather(*[fetch(url) for url in urls])
+        return [extract_gerrit_titles(body) if body is not None else None
+                for body in bodies]
+
+
 def scrape_with_cookies(url, cookies):
     """
     Scrapes a webpage for titles, truncating them, using provided cookies.
@@ -19,43 +132,44 @@ def scrape_with_cookies(url, cookies):
     Returns:
         A list of truncated titles found, or None if an error occurred.
     """
-    titles = []
-    with requests.Session() as session:
-        # Add the cookies to the session
-        session.cookies.update(cookies)
-
-        try:
-            print(f"Attempting to scrape {url} with provided cookies...")
-            response = session.get(url)
-            response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
-
-            if response.status_code == 200:
-                 print("Request successful. Parsing content.")
-            else:
-                 print(f"Request returned status code {response.status_code}. Cookies might be invalid or insufficient.", file=sys.stderr)
-                 if len(response.text) < 1000: # Print partial response for debugging
-                     print("Response content (partial):", response.text[:500] + '...' if len(response.text) > 500 else response.text, file=sys.stderr)
-                 return None
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-            td_tags = soup.find_all('td', class_='nav gerrit-subject')
-
-            for td in td_tags:
-                a_tag = td.find('a')
-                if a_tag:
-                    # Get text, strip whitespace, and truncate
-                    full_title = a_tag.get_text(strip=True)
-                    truncated_title = full_title[:MAX_SUMMARY_LENGTH]
-                    titles.append(truncated_title)
-
-            return titles
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching the URL: {e}", file=sys.stderr)
-            return None
-        except Exception as e:
-            print(f"An error occurred during parsing: {e}", file=sys.stderr)
-            return None
+    session = get_session()
+    # Add the cookies to the session
+    session.cookies.update(cookies)
+
+    try:
+        print(f"Attempting to scrape {url} with provided cookies...")
+        response = session.get(url)
+        response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
+        print("Request successful. Parsing content.")
+
+        return extract_gerrit_titles(response.content,
+                                     response.encoding or 'utf-8')
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching the URL: {e}", file=sys.stderr)
+        return None
+    except Exception as e:
+        print(f"An error occurred during parsing: {e}", file=sys.stderr)
+        return None
+
+@functools.lru_cache(maxsize=32)
+def _scrape_cached(url, cookie_items):
+    result = scrape_with_cookies(url, dict(cookie_items))
+    return tuple(result) if result is not None else None
+
+
+def scrape_cached(url, cookies):
+    """
+    Memoized front end for scrape_with_cookies.
+
+    Repeated calls with the same URL and cookies (e.g. matching one QTBUG
+    page against several branches) return the parsed titles from an
+    in-process cache instead of refetching and reparsing. Cookies are
+    normalized to a sorted tuple of items so the call is hashable.
+    """
+    result = _scrape_cached(url, tuple(sorted(cookies.items())))
+    return list(result) if result is not None else None
+
 
 def save_matching_commits_to_file(matching_commits, filename="matching_commits.txt"):
     """
@@ -67,25 +181,88 @@ def save_matching_commits_to_file(matching_commits, filename="matching_commits.t
         return
 
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            for commit_hash, summary in matching_commits:
-                # The summary saved here is the truncated one used in comparison
-                f.write(f"{commit_hash} {summary}\n")
+        # The summary saved here is the truncated one used in comparison.
+        # Matching worked on raw UTF-8 bytes, so skip decoding entirely:
+        # assemble one buffer and hand it to the OS in a single write.
+        buf = bytearray()
+        for commit_hash, summary in matching_commits:
+            buf += commit_hash
+            buf += b' '
+            buf += summary
+            buf += b'\n'
+        with open(filename, 'wb') as f:
+            f.write(buf)
         print(f"Matching commits successfully saved to {filename}")
     except IOError as e:
         print(f"Error writing to file {filename}: {e}", file=sys.stderr)
 
 
+def _get_commits_pygit2(repo_path, branch_name):
+    """
+    In-process variant of get_commits_on_branch using libgit2 via pygit2.
+    Walking the history directly skips the git fork/exec, the pipe, and the
+    text round trip; raw_message keeps the summaries as undecoded bytes.
+    """
+    try:
+        repo = pygit2.Repository(repo_path)
+    except pygit2.GitError:
+        print(f"Error: Directory '{repo_path}' does not appear to be a git repository.", file=sys.stderr)
+        return None
+
+    try:
+        if branch_name in repo.branches:
+            target = repo.branches[branch_name].target
+        else:
+            target = repo.revparse_single(branch_name).id
+    except (KeyError, pygit2.GitError):
+        print(f"Error: Branch '{branch_name}' not found or invalid in repository '{repo_path}'.", file=sys.stderr)
+        return None
+
+    print(f"Walking history of '{branch_name}' with pygit2...")
+    try:
+        return [(str(commit.id).encode('ascii'),
+                 commit.raw_message.split(b'\n', 1)[0][:MAX_SUMMARY_LENGTH])
+                for commit in repo.walk(target, pygit2.GIT_SORT_TIME)]
+    except pygit2.GitError as e:
+        print(f"Error walking repository history: {e}", file=sys.stderr)
+        return None
+
+
+def _iter_nul_records(stream, chunk_size=1 << 16):
+    """
+    Yields NUL-delimited records from a binary stream, without buffering
+    more than one chunk plus any record straddling a chunk boundary.
+    """
+    pending = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        records = pending.split(b'\0')
+        pending = records.pop()
+        yield from records
+    if pending:
+        yield pending
+
+
 def get_commits_on_branch(repo_path, branch_name):
     """
     Gets commit hashes and truncated summaries for a branch in a git repo.
-    Returns a list of (hash, truncated_summary) tuples, ordered by commit history.
+    Returns a list of (hash, truncated_summary) tuples of *bytes*, ordered by
+    commit history. Keeping the raw git output undecoded avoids a str
+    allocation per commit; only the matches are decoded when written out.
+
+    Uses libgit2 in-process when pygit2 is installed (see the 'fast' extra);
+    otherwise falls back to shelling out to git log.
     """
-    commits = []
     if not os.path.isdir(repo_path):
         print(f"Error: Repository path '{repo_path}' is not a valid directory.", file=sys.stderr)
         return None
 
+    if pygit2 is not None:
+        return _get_commits_pygit2(repo_path, branch_name)
+
     command = ["git", "-C", repo_path, "rev-parse", "--show-toplevel"]
     try:
         result = subprocess.run(
@@ -99,28 +276,35 @@ def get_commits_on_branch(repo_path, branch_name):
         return None
 
     try:
-        # Use git log to get commits in reverse chronological order (%H full hash, %s subject)
-        command = ["git", "-C", repo_path, "log", "--pretty=format:%H %s", branch_name]
+        # Use git log to get commits in reverse chronological order (%H full hash, %s subject).
+        # -z separates records with NUL, which can never appear in a
+        # subject, so the parse needs no per-record validation.
+        command = ["git", "-C", repo_path, "log", "-z", "--pretty=format:%H %s", branch_name]
         print(f"Running git command: {' '.join(command)}")
 
-        result = subprocess.run(
+        # Stream stdout as bytes and slice it directly; decoding every
+        # subject of a 100k-commit branch just to truncate it is wasted
+        # work when almost none of them will match. Iterating the pipe
+        # lets the tuple building run while git is still emitting, and
+        # keeps peak memory at one pipe buffer instead of the full log.
+        with subprocess.Popen(
             command,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-
-        output_lines = result.stdout.strip().split('\n')
-        for line in output_lines:
-            if line:
-                parts = line.split(' ', 1)
-                if len(parts) == 2:
-                    commit_hash, full_summary = parts
-                    # Truncate the commit summary
-                    truncated_summary = full_summary[:MAX_SUMMARY_LENGTH]
-                    commits.append((commit_hash, truncated_summary))
-                else:
-                    print(f"Warning: Skipping git log line with unexpected format: '{line}'", file=sys.stderr)
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=1 << 20
+        ) as process:
+            # Build the tuples in a single comprehension fed straight off
+            # the pipe; every NUL-delimited record is exactly
+            # '<hash> <subject>'. Summaries are truncated as they are
+            # sliced.
+            commits = [(commit_hash, full_summary[:MAX_SUMMARY_LENGTH])
+                       for commit_hash, sep, full_summary in
+                       (record.partition(b' ')
+                        for record in _iter_nul_records(process.stdout))]
+            stderr = process.stderr.read()
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
 
         return commits
 
@@ -128,9 +312,10 @@ def get_commits_on_branch(repo_path, branch_name):
         print(f"Error: 'git' command not found. Is Git installed and in your system's PATH?", file=sys.stderr)
         return None
     except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode('utf-8', 'replace')
         print(f"Error running git command: {e}", file=sys.stderr)
-        print(f"Git command stderr:\n{e.stderr.strip()}", file=sys.stderr)
-        if f"unknown revision or path not in the working tree" in e.stderr or f"ambiguous argument" in e.stderr:
+        print(f"Git command stderr:\n{stderr.strip()}", file=sys.stderr)
+        if f"unknown revision or path not in the working tree" in stderr or f"ambiguous argument" in stderr:
              print(f"Error: Branch '{branch_name}' not found or invalid in repository '{repo_path}'.", file=sys.stderr)
         return None
     except Exception as e:
@@ -144,13 +329,29 @@ def filter_titles_by_commits(scraped_titles_set, commits):
     the provided set of *truncated* scraped titles.
 
     Args:
-        scraped_titles_set: A set of unique *truncated* titles scraped from the web.
-        commits: A list of (hash, *truncated_summary*) tuples from git log, in repository order.
+        scraped_titles_set: A set of unique *truncated* UTF-8 bytes titles scraped from the web.
+        commits: A list of (hash, *truncated_summary*) bytes tuples from git log, in repository order.
 
     Returns:
         A list of (matching_hash, matching_truncated_summary) tuples, preserving
         the order from the 'commits' list.
     """
+    # On a qtbase-sized history nearly every commit is a non-match, so a
+    # small Bloom filter screens out the negatives with a few bit probes
+    # before the exact (correctness-preserving) set check runs. Optional,
+    # like pygit2: without pybloom-live the plain set lookup is used.
+    if ScalableBloomFilter is not None and scraped_titles_set:
+        bloom = ScalableBloomFilter(
+            initial_capacity=max(len(scraped_titles_set) * 4, 64),
+            error_rate=0.001)
+        for title in scraped_titles_set:
+            bloom.add(title)
+        # Iterate through commits in their repository order (newest first from git log default)
+        return [(commit_hash, truncated_summary)
+                for commit_hash, truncated_summary in commits
+                if truncated_summary in bloom
+                and truncated_summary in scraped_titles_set]
+
     matching_commits = []
     # Iterate through commits in their repository order (newest first from git log default)
     for commit_hash, truncated_summary in commits:
@@ -160,7 +361,12 @@ def filter_titles_by_commits(scraped_titles_set, commits):
     return matching_commits
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    """
+    CLI entry point. Accepts one or more QTBUG ticket numbers so a batch
+    run pays the imports, TLS setup, and git history walk once instead of
+    once per ticket; multiple tickets are fetched concurrently.
+    """
     # --- Set up argument parsing ---
     parser = argparse.ArgumentParser(
         description=f"Scrape Gerrit subject titles (truncated to {MAX_SUMMARY_LENGTH} chars) and match them against Git commits (truncated to {MAX_SUMMARY_LENGTH} chars) on a specific branch.",
@@ -173,7 +379,10 @@ if __name__ == "__main__":
 
     parser.add_argument(
         'QTBUG',
-        help='The QTBUG ticket number you want to scrape.',
+        help='One or more QTBUG ticket numbers you want to scrape. '
+        'With several tickets, pages are fetched concurrently and the git '
+        'history is only walked once; results go to matching_commits-<QTBUG>.txt.',
+        nargs='+',
         type=str
     )
 
@@ -199,36 +408,32 @@ if __name__ == "__main__":
     )
 
     # Parse the command-line arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-    # --- Scrape titles from the webpage ---
-    qtbug=f"QTBUG-{args.QTBUG.upper().removeprefix('QTBUG-').removeprefix('QTBUG')}"
-    SCRAPE_URL = f"https://bugreports.qt.io/browse/{qtbug}"
-    YOUR_COOKIES = {
+    # --- Scrape titles from the webpages ---
+    qtbugs = [f"QTBUG-{q.upper().removeprefix('QTBUG-').removeprefix('QTBUG')}"
+              for q in args.QTBUG]
+    scrape_urls = [f"https://bugreports.qt.io/browse/{qtbug}" for qtbug in qtbugs]
+    cookies = {
         'JSESSIONID': args.jsessionid,
         'atlassian.xsrf.token': args.atlassian_token,
     }
     print(f"Using JSESSIONID: {args.jsessionid[:5]}... (showing first 5 chars)")
     print(f"Using atlassian.xsrf.token: {args.atlassian_token[:5]}... (showing first 5 chars)")
 
-    # scraped_titles list will now contain truncated titles
-    scraped_titles = scrape_with_cookies(SCRAPE_URL, YOUR_COOKIES)
+    # The title lists will contain truncated titles. A single ticket goes
+    # through the cached synchronous path; several are fetched concurrently.
+    if len(scrape_urls) == 1:
+        all_scraped_titles = [scrape_cached(scrape_urls[0], cookies)]
+    else:
+        print(f"Fetching {len(scrape_urls)} QTBUG pages concurrently...")
+        all_scraped_titles = asyncio.run(scrape_many(scrape_urls, cookies))
 
-    if not scraped_titles:
+    if not any(all_scraped_titles):
         print("Failed to scrape titles from the webpage. Exiting.", file=sys.stderr)
         sys.exit(1)
 
-    print(f"Found {len(scraped_titles)} titles from webpage (truncated to {MAX_SUMMARY_LENGTH} chars).")
-
-    # --- Process scraped titles (Sort and Make Unique) ---
-    # Now sorting and unique-ing truncated titles
-    sorted_scraped_titles = sorted(scraped_titles)
-    unique_scraped_titles_set = set(sorted_scraped_titles) # Convert to set for efficient lookup
-
-    print(f"Processed to {len(unique_scraped_titles_set)} unique sorted truncated titles for matching.")
-
-
-    # --- Get commits from the local Git repository ---
+    # --- Get commits from the local Git repository (once, for all tickets) ---
     # repo_commits list will now contain (hash, truncated_summary) tuples
     repo_commits = get_commits_on_branch(args.repo_path, args.branch_name)
 
@@ -238,16 +443,40 @@ if __name__ == "__main__":
 
     print(f"Found {len(repo_commits)} commits on branch '{args.branch_name}' (summaries truncated to {MAX_SUMMARY_LENGTH} chars).")
 
+    for qtbug, scraped_titles in zip(qtbugs, all_scraped_titles):
+        if not scraped_titles:
+            print(f"Failed to scrape titles for {qtbug}. Skipping.", file=sys.stderr)
+            continue
 
-    # --- Filter titles against commits ---
-    # This compares the truncated summaries
-    matching_commits = filter_titles_by_commits(unique_scraped_titles_set, repo_commits)
+        print(f"Found {len(scraped_titles)} titles for {qtbug} (truncated to {MAX_SUMMARY_LENGTH} chars).")
 
-    # --- Save matching commits to a file ---
-    # Saves the full hash and the truncated summary used for matching
-    save_matching_commits_to_file(matching_commits)
+        # --- Process scraped titles (Make Unique) ---
+        # Dedup the truncated titles in one pass; the matching only needs a set
+        # for membership tests, so sorting the duplicates first was wasted work.
+        # Encode to UTF-8 bytes so the commit summaries from git log can be
+        # compared without decoding each one.
+        unique_scraped_titles_set = {t.encode('utf-8')[:MAX_SUMMARY_LENGTH]
+                                     for t in scraped_titles}
 
-    if matching_commits:
-        print(f"Found and saved {len(matching_commits)} matching commits (hash and truncated summary) in repository order.")
-    else:
-        print("No matching commits found among the scraped titles and the history of the specified branch.")
+        print(f"Processed to {len(unique_scraped_titles_set)} unique truncated titles for matching.")
+
+        # --- Filter titles against commits ---
+        # This compares the truncated summaries
+        matching_commits = filter_titles_by_commits(unique_scraped_titles_set, repo_commits)
+
+        # --- Save matching commits to a file ---
+        # Saves the full hash and the truncated summary used for matching
+        if len(qtbugs) == 1:
+            filename = "matching_commits.txt"
+        else:
+            filename = f"matching_commits-{qtbug}.txt"
+        save_matching_commits_to_file(matching_commits, filename)
+
+        if matching_commits:
+            print(f"Found and saved {len(matching_commits)} matching commits (hash and truncated summary) in repository order.")
+        else:
+            print(f"No matching commits found among the titles of {qtbug} and the history of the specified branch.")
+
+
+if __name__ == "__main__":
+    main()